@@ -10,6 +10,7 @@ class Settings(BaseModel):
     dashscope_api_key: str = Field(default_factory=lambda: (os.getenv("DASHSCOPE_API_KEY") or "").strip())
     embedding_model: str = "text-embedding-v1"
     top_k: int = 5
+    shard_workers: int = 4  # 分片并行检索的线程数
 
 SETTINGS = Settings()
 
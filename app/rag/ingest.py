@@ -1,16 +1,21 @@
 import os, glob, typer
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 from pypdf import PdfReader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import DashScopeEmbeddings
 from app.config import SETTINGS
+from app.rag.shards import (
+    classify_doc_type, classify_topic, collection_name, extract_year,
+    load_manifest, save_manifest, split_sections,
+)
 from langchain_community.document_loaders import TextLoader
 
 app = typer.Typer()
 os.environ["CHROMA_TELEMETRY_DISABLED"] = "1"
 
-def load_documents(input_dir: str) -> List[Tuple[str, str]]:
+def load_documents(input_dir: str) -> List[Tuple[str, str, Optional[int]]]:
+    """返回 (text, path, page)；PDF 按页返回（页码从 1 开始），文本文件 page=None。"""
     texts = []
     for path in glob.glob(os.path.join(input_dir, "**", "*"), recursive=True):
         if os.path.isdir(path):
@@ -18,19 +23,59 @@ def load_documents(input_dir: str) -> List[Tuple[str, str]]:
         if path.lower().endswith(".pdf"):
             try:
                 reader = PdfReader(path)
-                text = "\n".join(page.extract_text() or "" for page in reader.pages)
-                texts.append((text, path))
+                for i, page in enumerate(reader.pages, 1):
+                    texts.append((page.extract_text() or "", path, i))
             except Exception:
                 pass
         elif any(path.lower().endswith(ext) for ext in [".txt", ".md"]):
             try:
                 loader = TextLoader(path, encoding="utf-8")
                 text = loader.load()[0].page_content
-                texts.append((text, path))
+                texts.append((text, path, None))
             except Exception:
                 pass
     return texts
 
+def build_shards(raw: List[Tuple[str, str, Optional[int]]], splitter) -> Dict[str, Tuple[List[str], List[dict]]]:
+    """把 load_documents 的结果切块并按 {collection: (texts, metadatas)} 分组；没有文本的页/文件不建分片。"""
+    # 主题/类型/年份按整篇文档判定（PDF 各页合并后判定），保证同一文件落在同一分片
+    pages: Dict[str, List[str]] = {}
+    for text, src, _ in raw:
+        pages.setdefault(src, []).append(text)
+    file_meta: Dict[str, dict] = {}
+    for src, texts in pages.items():
+        whole = "\n".join(texts)
+        meta = {
+            "source": src,
+            "file_type": os.path.splitext(src)[1].lstrip(".").lower(),
+            "topic": classify_topic(whole),
+            "doc_type": classify_doc_type(src, whole),
+        }
+        # Chroma 元数据不接受 None，缺失字段直接不写
+        year = extract_year(whole)
+        if year:
+            meta["year"] = year
+        file_meta[src] = meta
+
+    shards: Dict[str, Tuple[List[str], List[dict]]] = {}
+    for text, src, page in raw:
+        base = dict(file_meta[src])
+        if page is not None:
+            base["page"] = page
+        chunks = [
+            (chunk, {**base, "section": sec["section"]} if sec["section"] else base)
+            for sec in split_sections(text)
+            for chunk in splitter.split_text(sec["text"])
+        ]
+        # 空页/扫描件没有文本，不建分片
+        if not chunks:
+            continue
+        docs, metas = shards.setdefault(collection_name(base["topic"], base["doc_type"]), ([], []))
+        for chunk, meta in chunks:
+            docs.append(chunk)
+            metas.append(dict(meta))
+    return shards
+
 @app.command()
 def main(
     input_dir: str = typer.Option("./data/samples", help="Input folder"),
@@ -40,16 +85,13 @@ def main(
 ):
     os.makedirs(persist_dir, exist_ok=True)
     raw = load_documents(input_dir)
-    print(f"[Ingest] Scanning {len(raw)} files under {input_dir} ...")
+    print(f"[Ingest] Scanning {len({src for _, src, _ in raw})} files under {input_dir} ...")
 
     splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    docs, metas = [], []
-    for text, src in raw:
-        for chunk in splitter.split_text(text):
-            docs.append(chunk)
-            metas.append({"source": src})
+    shards = build_shards(raw, splitter)
+    total_chunks = sum(len(docs) for docs, _ in shards.values())
 
-    if not docs:
+    if total_chunks == 0:
         print("No documents found for ingestion.")
         raise SystemExit(0)
 
@@ -58,15 +100,26 @@ def main(
         dashscope_api_key=os.getenv("DASHSCOPE_API_KEY") or SETTINGS.dashscope_api_key,
     )
 
-    vectordb = Chroma.from_texts(
-        texts=docs,
-        embedding=embeddings,
-        metadatas=metas,
-        persist_directory=persist_dir,
-    )
+    # 每次 ingest 都从头重建分片：删掉上次清单里的集合，避免重复入库，
+    # 以及分类规则变化后同一文件残留在旧分片里
+    for name in load_manifest(persist_dir):
+        Chroma(collection_name=name, persist_directory=persist_dir).delete_collection()
+
+    manifest = {}
+    for name, (docs, metas) in sorted(shards.items()):
+        vectordb = Chroma.from_texts(
+            texts=docs,
+            embedding=embeddings,
+            metadatas=metas,
+            collection_name=name,
+            persist_directory=persist_dir,
+        )
+        vectordb.persist()
+        manifest[name] = {"topic": metas[0]["topic"], "doc_type": metas[0]["doc_type"]}
+        print(f"  [{name}] {len(docs)} chunks")
 
-    vectordb.persist()
-    print(f"Ingested {len(docs)} chunks into {persist_dir}")
+    save_manifest(persist_dir, manifest)
+    print(f"Ingested {total_chunks} chunks into {len(shards)} shards under {persist_dir}")
     print("✅ Ingest done.")
 
 if __name__ == "__main__":
@@ -1,5 +1,7 @@
 # app/rag/retriever.py
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv, find_dotenv
 
 try:
@@ -7,8 +9,62 @@ try:
 except Exception:
     from langchain_community.vectorstores import Chroma
 
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
 from langchain_community.embeddings import DashScopeEmbeddings
 from app.config import SETTINGS
+from app.rag.shards import load_manifest, route_query, select_shards
+
+
+class ShardedRetriever(BaseRetriever):
+    """按主题/类型分片检索：路由到相关分片 → 下推元数据过滤 → 并行查询 → 按距离合并。"""
+
+    shards: Dict[str, Any]
+    manifest: Dict[str, Dict[str, Any]]
+    embedding: Any
+    top_k: int = 5
+    max_workers: int = 4
+
+    def _search_shard(self, name: str, vector: List[float], where: Optional[dict]) -> List[Tuple[Document, float]]:
+        return self.shards[name].similarity_search_by_vector_with_relevance_scores(
+            vector, k=self.top_k, filter=where,
+        )
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        route = route_query(query)
+        names = select_shards(self.manifest, route["topics"], route["doc_types"])
+        # 问题向量只算一次，各分片复用
+        vector = self.embedding.embed_query(query)
+
+        def search(name: str, where: Optional[dict]):
+            try:
+                return self._search_shard(name, vector, where), None
+            except Exception as e:
+                return [], e
+
+        def run(where):
+            workers = max(1, min(self.max_workers, len(names)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda n: search(n, where), names))
+            errors = [(n, e) for n, (_, e) in zip(names, results) if e is not None]
+            # 全部分片失败（过滤条件非法、鉴权、集合缺失等）时直接抛出，交给 graph.retrieve_docs 处理，
+            # 不要伪装成"无命中"再走无过滤回退
+            if errors and len(errors) == len(names):
+                raise errors[0][1]
+            for n, e in errors:
+                print(f"[Retriever][WARN] shard={n} {e!r}")
+            return [hit for hits, _ in results for hit in hits]
+
+        hits = run(route["where"])
+        # 过滤条件过严（如年份缺失）时退回无过滤检索，避免空结果
+        if not hits and route["where"]:
+            hits = run(None)
+        print(f"[Retriever] shards={names}  where={route['where']}")
+        # Chroma 返回的是距离，越小越相关
+        hits.sort(key=lambda h: h[1])
+        return [doc for doc, _ in hits[:self.top_k]]
+
 
 def build_retriever(persist_dir: str = "./.chroma_mof", top_k: int = 5):
     # 统一加载 .env，无论从哪里启动
@@ -26,5 +82,22 @@ def build_retriever(persist_dir: str = "./.chroma_mof", top_k: int = 5):
         model=getattr(SETTINGS, "embedding_model", "text-embedding-v1"),
         dashscope_api_key=key,
     )
-    db = Chroma(persist_directory=persist_abs, embedding_function=embed)
-    return db.as_retriever(search_kwargs={"k": top_k})
+
+    manifest = load_manifest(persist_abs)
+    if not manifest:
+        # 旧版单集合库（无 shards.json），保持原行为
+        db = Chroma(persist_directory=persist_abs, embedding_function=embed)
+        return db.as_retriever(search_kwargs={"k": top_k})
+
+    shards = {
+        name: Chroma(collection_name=name, persist_directory=persist_abs, embedding_function=embed)
+        for name in manifest
+    }
+    print(f"[Retriever] {len(shards)} shards: {sorted(shards)}")
+    return ShardedRetriever(
+        shards=shards,
+        manifest=manifest,
+        embedding=embed,
+        top_k=top_k,
+        max_workers=getattr(SETTINGS, "shard_workers", 4),
+    )
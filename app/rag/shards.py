@@ -0,0 +1,178 @@
+# app/rag/shards.py
+"""分片（shard）约定：ingest 与 retriever 共用的主题/文档类型划分与元数据规则。"""
+import json, os, re
+from typing import Any, Dict, List, Optional
+
+MANIFEST_NAME = "shards.json"
+COLLECTION_PREFIX = "mof"
+DEFAULT_TOPIC = "general"
+DEFAULT_DOC_TYPE = "paper"
+
+# 主题关键词（小写匹配；中英文都收）。只收主题专属词，
+# loading/release/adsorption/activation 这类跨主题通用词会把 "CO2 loading" 误路由到药物分片
+TOPIC_KEYWORDS: Dict[str, List[str]] = {
+    "co2_capture": ["co2", "co₂", "carbon dioxide", "carbon capture", "flue gas", "gas separation", "isotherm", "二氧化碳", "烟道气", "气体分离", "等温线", "捕集"],
+    "drug_delivery": ["drug", "doxorubicin", "ibuprofen", "药物", "载药", "药物递送"],
+    "synthesis": ["synthesis", "synthesize", "synthesized", "solvothermal", "hydrothermal", "modulator", "合成", "溶剂热", "水热", "调节剂"],
+}
+
+# 文档类型关键词（先匹配文件名，再匹配标题行）
+DOC_TYPE_KEYWORDS: Dict[str, List[str]] = {
+    "review": ["review", "综述"],
+    "notes": ["notes", "笔记", "讲义"],
+}
+
+# 用 lookaround 而不是 \b：\b 在数字/拉丁字母与汉字之间不成立（如 "2021年"、"PDF里"）
+_YEAR = r"(?<!\d)(19[5-9]\d|20[0-4]\d)(?!\d)"
+# 引文中的年份：后接标点，且不是页码区间（"2012-2020,"）
+_CITED_YEAR_RE = re.compile(r"(?<![\d\-–])(19[5-9]\d|20[0-4]\d)(?=\s*[,;.)）])")
+_REFERENCE_LINE_RE = re.compile(r"^.*(?:references?|参考文献|出处)\W*[:：].*$", re.I | re.M)
+_REFERENCE_HEAD_RE = re.compile(r"^\W*(?:references|bibliography|参考文献)\W*$", re.I | re.M)
+# 文件类型只在措辞明确时过滤：裸 "md" 常指分子动力学（MD simulation），不能当扩展名
+_FILE_TYPE_RULES = [
+    ("pdf", re.compile(r"(?<![a-z])pdf(?![a-z])")),
+    ("md", re.compile(r"(?<![a-z])markdown(?![a-z])|\.md(?![a-z])|(?<![a-z])md\s*(?:files?|文件|文档)")),
+    ("txt", re.compile(r"\.txt(?![a-z])|(?<![a-z])txt\s*(?:files?|文件|文档)")),
+]
+# 问题里的年份只在措辞明确时才当作过滤条件，避免把 "2000 m2/g"、"2000 mmol" 当年份
+_QUERY_YEAR = _YEAR + r"(?!\s*(?:m2|m²|mmol|mg|wt|k\b|°|%|℃))"
+# 英文介词后的数字须以分句结尾（标点/句末/汉字）收尾，或后接常见虚词，才算年份；
+# "after 2000 cycles"、"in 1960 s" 这类后接名词/单位的一律不算
+_CLAUSE_END = r"(?=\s*(?:$|[,;.?!，。；？！、)）]|[\u4e00-\u9fff]))"
+_YEAR_TAIL = r"(?=\s*(?:$|[,;.?!，。；？！、)）]|[\u4e00-\u9fff]|(?:on|about|for|with|and|or|onwards?)(?![a-z])))"
+_QUERY_YEAR_RULES = [
+    ("$gte", re.compile(r"(?<![a-z])(?:since|from)\s+" + _QUERY_YEAR + _YEAR_TAIL, re.I)),
+    ("$gte", re.compile(_QUERY_YEAR + r"\s*年?\s*(?:以来|起)")),
+    ("$gt", re.compile(r"(?<![a-z])(?:after|later than|newer than)\s+" + _QUERY_YEAR + _YEAR_TAIL, re.I)),
+    ("$gt", re.compile(_QUERY_YEAR + r"\s*年?\s*(?:之后|以后)")),
+    ("$lt", re.compile(r"(?<![a-z])(?:before|prior to|earlier than)\s+" + _QUERY_YEAR + _YEAR_TAIL, re.I)),
+    ("$lt", re.compile(_QUERY_YEAR + r"\s*年?\s*(?:之前|以前)")),
+    ("$eq", re.compile(r"(?<![a-z])(?:published|publication year|in the year|year)\s+(?:in\s+|of\s+)?" + _QUERY_YEAR, re.I)),
+    ("$eq", re.compile(r"(?<![a-z])in\s+" + _QUERY_YEAR + _CLAUSE_END, re.I)),
+    ("$eq", re.compile(_QUERY_YEAR + r"\s*年")),
+]
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$", re.M)
+
+
+def _keyword_re(words: List[str]):
+    # 英文词要求左侧不是字母，避免 "footnotes" 命中 notes、"preview" 命中 review；允许复数等后缀
+    return re.compile("|".join(
+        (r"(?<![a-z])" + re.escape(w)) if w.isascii() else re.escape(w) for w in words
+    ))
+
+
+_TOPIC_RES = {name: _keyword_re(words) for name, words in TOPIC_KEYWORDS.items()}
+_DOC_TYPE_RES = {name: _keyword_re(words) for name, words in DOC_TYPE_KEYWORDS.items()}
+
+
+def _match_keywords(text: str, table: Dict[str, Any]) -> List[str]:
+    low = text.lower()
+    return [name for name, pattern in table.items() if pattern.search(low)]
+
+
+def classify_topic(text: str) -> str:
+    """按关键词命中次数选主题；都不命中则归入 general。"""
+    low = text.lower()
+    scores = {t: len(pattern.findall(low)) for t, pattern in _TOPIC_RES.items()}
+    best = max(scores, key=scores.get)
+    return best if scores[best] > 0 else DEFAULT_TOPIC
+
+
+def classify_doc_type(path: str, text: str = "") -> str:
+    # 只看首行标题，避免把 "Chemical Reviews" 之类的期刊名误判为综述
+    title = text.strip().split("\n", 1)[0] if text.strip() else ""
+    hits = _match_keywords(os.path.basename(path), _DOC_TYPE_RES) or _match_keywords(title, _DOC_TYPE_RES)
+    return hits[0] if hits else DEFAULT_DOC_TYPE
+
+
+def extract_year(text: str) -> Optional[int]:
+    """
+    估计文档年份：取参考文献中最新的被引年份（发表年份的下限）。
+    参考文献 = 全文任意位置的 "Reference: ..." 行 + 最后一个 References/参考文献 标题之后的内容
+    （PDF 的参考文献通常在文末）；两者都没有则视为无年份。
+    """
+    refs = [m.group(0) for m in _REFERENCE_LINE_RE.finditer(text)]
+    heads = list(_REFERENCE_HEAD_RE.finditer(text))
+    if heads:
+        refs.append(text[heads[-1].end():])
+    years = [int(y) for y in _CITED_YEAR_RE.findall("\n".join(refs))]
+    return max(years) if years else None
+
+
+def _query_year_filter(query: str) -> Optional[Dict[str, Any]]:
+    for op, pattern in _QUERY_YEAR_RULES:
+        m = pattern.search(query)
+        if m:
+            year = int(m.group(1))
+            return {"year": year} if op == "$eq" else {"year": {op: year}}
+    return None
+
+
+def split_sections(text: str) -> List[Dict[str, Any]]:
+    """按 Markdown 标题切成 [{"section":..., "text":...}]；无标题时整体作为一个段落。"""
+    matches = list(_HEADING_RE.finditer(text))
+    if not matches:
+        return [{"section": "", "text": text}]
+    sections = []
+    if text[:matches[0].start()].strip():
+        sections.append({"section": "", "text": text[:matches[0].start()]})
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.append({"section": m.group(1).strip(), "text": text[m.start():end]})
+    return sections
+
+
+def collection_name(topic: str, doc_type: str) -> str:
+    return f"{COLLECTION_PREFIX}_{topic}_{doc_type}"
+
+
+def load_manifest(persist_dir: str) -> Dict[str, Dict[str, Any]]:
+    """读取 {collection: {"topic":..., "doc_type":...}}；旧版单集合库没有该文件，返回空。"""
+    path = os.path.join(persist_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(persist_dir: str, manifest: Dict[str, Dict[str, Any]]):
+    path = os.path.join(persist_dir, MANIFEST_NAME)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def route_query(query: str) -> Dict[str, Any]:
+    """从问题里解析出要访问的主题/类型，以及可下推到 Chroma 的元数据过滤条件。"""
+    topics = _match_keywords(query, _TOPIC_RES)
+    doc_types = _match_keywords(query, _DOC_TYPE_RES)
+    clauses: List[Dict[str, Any]] = []
+    year = _query_year_filter(query)
+    if year:
+        clauses.append(year)
+    low = query.lower()
+    file_type = next((ft for ft, pattern in _FILE_TYPE_RULES if pattern.search(low)), None)
+    if file_type:
+        clauses.append({"file_type": file_type})
+    where = None
+    if len(clauses) == 1:
+        where = clauses[0]
+    elif clauses:
+        where = {"$and": clauses}
+    return {"topics": topics, "doc_types": doc_types, "where": where}
+
+
+def select_shards(manifest: Dict[str, Dict[str, Any]], topics: List[str], doc_types: List[str]) -> List[str]:
+    """
+    按主题/类型挑选分片。类型按主题逐个收窄：某主题下没有该类型的分片时保留该主题全部分片；
+    general 分片始终参与（指定类型时只取同类型的）。什么都挑不到时回退到全部分片。
+    """
+    def of_type(names: List[str]) -> List[str]:
+        return [n for n in names if manifest[n].get("doc_type") in doc_types] if doc_types else names
+
+    if not topics:
+        return of_type(list(manifest)) or list(manifest)
+    picked = set(of_type([n for n, info in manifest.items() if info.get("topic") == DEFAULT_TOPIC]))
+    for topic in topics:
+        names = [n for n, info in manifest.items() if info.get("topic") == topic]
+        picked.update(of_type(names) or names)
+    return [n for n in manifest if n in picked] or list(manifest)
@@ -0,0 +1,100 @@
+# tests/test_ingest.py
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.rag import ingest
+from app.rag.shards import load_manifest
+
+CO2_PDF_PAGES = [
+    "ZIF-8 CO2 isotherm at 298 K.\nFlue gas separation with CO2 selectivity.",
+    "",  # 扫描页 / 空页
+    "References\n1. A. Author, Science, 2011.\n",
+]
+
+
+class _Page:
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        return self.text
+
+
+class _Reader:
+    def __init__(self, path):
+        self.pages = [_Page(t) for t in CO2_PDF_PAGES]
+
+
+def _splitter():
+    return RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=0)
+
+
+def test_load_documents_returns_pdf_pages(tmp_path, monkeypatch):
+    (tmp_path / "zif8.pdf").write_bytes(b"%PDF-stub")
+    (tmp_path / "notes.md").write_text("# UiO-66 drug loading\nDOX 10–30 wt%", encoding="utf-8")
+    monkeypatch.setattr(ingest, "PdfReader", _Reader)
+
+    raw = sorted(ingest.load_documents(str(tmp_path)), key=lambda r: (r[1], r[2] or 0))
+    assert [(src.rsplit("/", 1)[-1], page) for _, src, page in raw] == [
+        ("notes.md", None), ("zif8.pdf", 1), ("zif8.pdf", 2), ("zif8.pdf", 3),
+    ]
+
+
+def test_build_shards_one_shard_per_file_and_skips_empty_pages():
+    raw = [(text, "a/zif8.pdf", i) for i, text in enumerate(CO2_PDF_PAGES, 1)]
+    raw += [
+        ("# UiO-66 drug loading\n## Factors\nDOX loading depends on pore size.", "a/uio66_notes.md", None),
+        ("   ", "a/empty.txt", None),
+    ]
+    shards = ingest.build_shards(raw, _splitter())
+
+    assert sorted(shards) == ["mof_co2_capture_paper", "mof_drug_delivery_notes"]
+    _, pdf_metas = shards["mof_co2_capture_paper"]
+    # 整篇 PDF 统一判定主题/年份，参考文献页的年份对所有页生效；空页不产生分块
+    assert sorted({m["page"] for m in pdf_metas}) == [1, 3]
+    assert all(m["year"] == 2011 and m["file_type"] == "pdf" for m in pdf_metas)
+    _, md_metas = shards["mof_drug_delivery_notes"]
+    assert {m.get("section") for m in md_metas} == {"UiO-66 drug loading", "Factors"}
+    assert all("page" not in m and "year" not in m for m in md_metas)
+
+
+def test_build_shards_empty_input_has_no_shards():
+    raw = [("", "a/scan.pdf", 1), ("", "a/scan.pdf", 2), ("\n", "a/empty.md", None)]
+    assert ingest.build_shards(raw, _splitter()) == {}
+
+
+def test_main_exits_when_nothing_to_ingest(tmp_path, capsys):
+    (tmp_path / "empty.md").write_text("", encoding="utf-8")
+    persist = tmp_path / "db"
+    with pytest.raises(SystemExit):
+        ingest.main(input_dir=str(tmp_path), persist_dir=str(persist), chunk_size=200, chunk_overlap=0)
+    assert "No documents found" in capsys.readouterr().out
+    assert load_manifest(str(persist)) == {}
+
+
+def test_main_rebuilds_shards_on_reingest(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(ingest, "DashScopeEmbeddings", lambda **kw: DeterministicFakeEmbedding(size=16))
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    sample = docs / "zif8.md"
+    sample.write_text("# ZIF-8\nCO2 isotherm and flue gas separation.", encoding="utf-8")
+    persist = str(tmp_path / "db")
+
+    def run():
+        ingest.main(input_dir=str(docs), persist_dir=persist, chunk_size=200, chunk_overlap=0)
+
+    run()
+    assert "Scanning 1 files" in capsys.readouterr().out
+    assert list(load_manifest(persist)) == ["mof_co2_capture_paper"]
+
+    # 再次 ingest 不重复入库；分类变化后旧分片被清掉
+    run()
+    sample.write_text("# UiO-66\nDoxorubicin drug loading.", encoding="utf-8")
+    run()
+    assert list(load_manifest(persist)) == ["mof_drug_delivery_paper"]
+
+    import chromadb
+    client = chromadb.PersistentClient(path=persist)
+    counts = {c.name: c.count() for c in client.list_collections()}
+    assert counts == {"mof_drug_delivery_paper": 1}
@@ -0,0 +1,120 @@
+# tests/test_retriever.py
+import threading
+
+import pytest
+from langchain_core.documents import Document
+
+from app.rag.retriever import ShardedRetriever
+
+MANIFEST = {
+    "mof_co2_capture_paper": {"topic": "co2_capture", "doc_type": "paper"},
+    "mof_co2_capture_notes": {"topic": "co2_capture", "doc_type": "notes"},
+    "mof_drug_delivery_paper": {"topic": "drug_delivery", "doc_type": "paper"},
+}
+
+
+class StubEmbedding:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [0.0, 1.0]
+
+
+class StubShard:
+    """模拟 Chroma：返回预设的 (Document, distance)，并记录收到的过滤条件。"""
+
+    def __init__(self, hits, only_unfiltered=False, error=None, barrier=None):
+        self.hits = hits
+        self.only_unfiltered = only_unfiltered
+        self.error = error
+        self.barrier = barrier
+        self.filters = []
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None):
+        self.filters.append(filter)
+        if self.barrier is not None:
+            self.barrier.wait()  # 所有分片同时在途才放行：串行执行会超时
+        if self.error is not None:
+            raise self.error
+        if self.only_unfiltered and filter is not None:
+            return []
+        return [(Document(page_content=t, metadata={"source": t}), d) for t, d in self.hits][:k]
+
+
+def _retriever(shards, top_k=2, max_workers=4):
+    embedding = StubEmbedding()
+    return ShardedRetriever(
+        shards=shards, manifest=MANIFEST, embedding=embedding, top_k=top_k, max_workers=max_workers,
+    ), embedding
+
+
+def _texts(docs):
+    return [d.page_content for d in docs]
+
+
+def test_fans_out_to_routed_shards_and_merges_by_distance():
+    shards = {
+        "mof_co2_capture_paper": StubShard([("paper-a", 0.30), ("paper-b", 0.90)]),
+        "mof_co2_capture_notes": StubShard([("notes-a", 0.10), ("notes-b", 0.50)]),
+        "mof_drug_delivery_paper": StubShard([("drug-a", 0.01)]),
+    }
+    retriever, embedding = _retriever(shards, top_k=3)
+
+    docs = retriever.invoke("ZIF-8 CO2 isotherm")
+
+    assert _texts(docs) == ["notes-a", "paper-a", "notes-b"]
+    assert shards["mof_drug_delivery_paper"].filters == []  # 不相关分片不查询
+    assert embedding.calls == 1  # 问题向量只算一次
+
+
+def test_queries_shards_in_parallel():
+    barrier = threading.Barrier(2, timeout=5)
+    shards = {
+        "mof_co2_capture_paper": StubShard([("paper-a", 0.3)], barrier=barrier),
+        "mof_co2_capture_notes": StubShard([("notes-a", 0.1)], barrier=barrier),
+        "mof_drug_delivery_paper": StubShard([]),
+    }
+    retriever, _ = _retriever(shards, max_workers=2)
+    assert _texts(retriever.invoke("CO2 capture")) == ["notes-a", "paper-a"]
+
+
+def test_pushes_filter_down_and_falls_back_when_empty():
+    shards = {name: StubShard([(name, 0.2)], only_unfiltered=True) for name in MANIFEST}
+    retriever, _ = _retriever(shards, top_k=5)
+
+    docs = retriever.invoke("drug delivery papers published in 2011")
+
+    assert _texts(docs) == ["mof_drug_delivery_paper"]
+    assert shards["mof_drug_delivery_paper"].filters == [{"year": 2011}, None]
+
+
+def test_no_fallback_when_filter_has_hits():
+    shards = {name: StubShard([(name, 0.2)]) for name in MANIFEST}
+    retriever, _ = _retriever(shards)
+    retriever.invoke("drug delivery papers published in 2011")
+    assert shards["mof_drug_delivery_paper"].filters == [{"year": 2011}]
+
+
+def test_reraises_when_every_shard_fails():
+    shards = {name: StubShard([], error=ValueError("bad where")) for name in MANIFEST}
+    retriever, _ = _retriever(shards)
+    with pytest.raises(ValueError, match="bad where"):
+        retriever.invoke("papers published in 2011")
+    # 不会因为"无命中"而走无过滤回退
+    assert all(s.filters == [{"year": 2011}] for s in shards.values())
+
+
+def test_warns_and_keeps_hits_when_some_shards_fail(capsys):
+    shards = {
+        "mof_co2_capture_paper": StubShard([], error=RuntimeError("collection missing")),
+        "mof_co2_capture_notes": StubShard([("notes-a", 0.1)]),
+        "mof_drug_delivery_paper": StubShard([]),
+    }
+    retriever, _ = _retriever(shards)
+
+    assert _texts(retriever.invoke("CO2 capture")) == ["notes-a"]
+    out = capsys.readouterr().out
+    assert "[Retriever][WARN] shard=mof_co2_capture_paper" in out
+    assert "collection missing" in out
@@ -0,0 +1,185 @@
+# tests/test_shards.py
+import pytest
+
+from app.rag.shards import (
+    classify_doc_type, classify_topic, extract_year, load_manifest, route_query,
+    save_manifest, select_shards, split_sections,
+)
+
+MANIFEST = {
+    "mof_co2_capture_paper": {"topic": "co2_capture", "doc_type": "paper"},
+    "mof_co2_capture_notes": {"topic": "co2_capture", "doc_type": "notes"},
+    "mof_drug_delivery_review": {"topic": "drug_delivery", "doc_type": "review"},
+    "mof_general_paper": {"topic": "general", "doc_type": "paper"},
+}
+
+
+# ---------- route_query: 年份 ----------
+@pytest.mark.parametrize("query", [
+    "CO2 capture loading 2000 mmol",
+    "BET surface area of 2000 m2/g",
+    "surface area in 2000 m2/g",
+    "stable within 2000 cycles",
+    "CO2 uptake in 2000 cycles",
+    "CO2 uptake retained after 2000 cycles",
+    "heating ramp in 1960 s",
+    "UiO-66 药物负载的典型范围？",
+])
+def test_route_query_ignores_numbers_that_are_not_years(query):
+    assert route_query(query)["where"] is None
+
+
+@pytest.mark.parametrize("query, where", [
+    ("papers published in 2011", {"year": 2011}),
+    ("ZIF-8 CO2 papers in 2011", {"year": 2011}),
+    ("what was reported in 2011?", {"year": 2011}),
+    ("2021年发表的CO2吸附综述", {"year": 2021}),
+    ("drug delivery since 2015", {"year": {"$gte": 2015}}),
+    ("2018年以来的合成方法", {"year": {"$gte": 2018}}),
+    ("CO2 isotherms after 2010", {"year": {"$gt": 2010}}),
+    ("2018年以后的合成", {"year": {"$gt": 2018}}),
+    ("work before 2005", {"year": {"$lt": 2005}}),
+    ("2005年之前的工作", {"year": {"$lt": 2005}}),
+])
+def test_route_query_year_filter(query, where):
+    assert route_query(query)["where"] == where
+
+
+# ---------- route_query: 文件类型 / CJK 边界 ----------
+@pytest.mark.parametrize("query", ["只看PDF里的结果", "only pdf results", "pdf文件中的CO2数据"])
+def test_route_query_file_type_next_to_cjk(query):
+    assert route_query(query)["where"] == {"file_type": "pdf"}
+
+
+@pytest.mark.parametrize("query, file_type", [
+    ("notes in .md files", "md"),
+    ("markdown 笔记里的 CO2 数据", "md"),
+    ("md文件中的结果", "md"),
+    ("only .txt sources", "txt"),
+])
+def test_route_query_explicit_file_type(query, file_type):
+    assert route_query(query)["where"] == {"file_type": file_type}
+
+
+@pytest.mark.parametrize("query", [
+    "mdpi journals",
+    "MD simulations of CO2 diffusion in ZIF-8",
+    "MD 模拟 ZIF-8 中的 CO2 扩散",
+])
+def test_route_query_bare_md_is_not_a_file_type(query):
+    assert route_query(query)["where"] is None
+
+
+def test_route_query_combines_filters():
+    where = route_query("2021年的PDF")["where"]
+    assert where == {"$and": [{"year": 2021}, {"file_type": "pdf"}]}
+
+
+# ---------- route_query: 主题 / 类型 ----------
+def test_route_query_generic_words_do_not_route_to_drug_delivery():
+    assert route_query("CO2 loading at 298 K")["topics"] == ["co2_capture"]
+
+
+def test_route_query_topics_and_doc_types():
+    route = route_query("UiO-66 drug loading review")
+    assert route["topics"] == ["drug_delivery"]
+    assert route["doc_types"] == ["review"]
+
+
+# ---------- select_shards ----------
+def test_select_shards_by_topic_keeps_general():
+    assert select_shards(MANIFEST, ["co2_capture"], []) == [
+        "mof_co2_capture_paper", "mof_co2_capture_notes", "mof_general_paper",
+    ]
+
+
+def test_select_shards_by_topic_and_type():
+    assert select_shards(MANIFEST, ["drug_delivery"], ["review"]) == ["mof_drug_delivery_review"]
+
+
+def test_select_shards_relaxes_type_per_topic():
+    # co2_capture 没有 review 分片 → 保留该主题全部分片；general 只取同类型（这里没有）
+    assert select_shards(MANIFEST, ["co2_capture"], ["review"]) == [
+        "mof_co2_capture_paper", "mof_co2_capture_notes",
+    ]
+
+
+def test_select_shards_general_review_does_not_crowd_out_topic():
+    manifest = {
+        "mof_co2_capture_paper": {"topic": "co2_capture", "doc_type": "paper"},
+        "mof_general_review": {"topic": "general", "doc_type": "review"},
+    }
+    assert select_shards(manifest, ["co2_capture"], ["review"]) == [
+        "mof_co2_capture_paper", "mof_general_review",
+    ]
+
+
+def test_select_shards_type_only():
+    assert select_shards(MANIFEST, [], ["notes"]) == ["mof_co2_capture_notes"]
+    assert select_shards(MANIFEST, [], ["missing"]) == list(MANIFEST)
+
+
+def test_select_shards_without_route_uses_all():
+    assert select_shards(MANIFEST, [], []) == list(MANIFEST)
+
+
+# ---------- split_sections ----------
+def test_split_sections_by_headings():
+    text = "preface\n# Title\nintro\n## Part A\naaa\n## Part B\nbbb\n"
+    sections = split_sections(text)
+    assert [s["section"] for s in sections] == ["", "Title", "Part A", "Part B"]
+    assert "aaa" in sections[2]["text"] and "bbb" not in sections[2]["text"]
+
+
+def test_split_sections_without_headings():
+    assert split_sections("plain text") == [{"section": "", "text": "plain text"}]
+
+
+# ---------- classify_* ----------
+def test_classify_topic():
+    assert classify_topic("ZIF-8 CO₂ isotherm and flue gas separation") == "co2_capture"
+    assert classify_topic("Doxorubicin loading and release in UiO-66") == "drug_delivery"
+    assert classify_topic("Solvothermal synthesis with acetic acid modulator") == "synthesis"
+    assert classify_topic("Crystal structure of a framework") == "general"
+
+
+def test_classify_topic_ignores_cross_topic_words():
+    # activation / adsorption / loading 不再把 CO2 文档拉到其他主题
+    text = "CO2 adsorption isotherm after activation; CO2 loading at 1 bar"
+    assert classify_topic(text) == "co2_capture"
+
+
+def test_classify_doc_type_uses_filename_and_title_only():
+    assert classify_doc_type("data/MOF_review.md") == "review"
+    assert classify_doc_type("data/x_notes.md") == "notes"
+    assert classify_doc_type("data/a.md", "# 课程笔记\nbody") == "notes"
+    # 期刊名 "Chemical Reviews" 不应使论文被判为综述
+    assert classify_doc_type("data/a.md", "# UiO-66\n**Reference:** Horcajada, *Chemical Reviews*, 2012.") == "paper"
+
+
+@pytest.mark.parametrize("path", ["data/footnotes.pdf", "data/preview_zif8.md"])
+def test_classify_doc_type_filename_matches_whole_words(path):
+    assert classify_doc_type(path) == "paper"
+
+
+# ---------- extract_year ----------
+def test_extract_year_from_reference_line():
+    text = "# Mg-MOF-74\n**Reference:** Rosi et al., *Science*, 2005; Queen et al., *JACS*, 2011.\n"
+    assert extract_year(text) == 2011
+
+
+def test_extract_year_from_reference_section_at_end():
+    body = "Surface area 2000 m2/g measured in 2019 lab.\n" * 200
+    refs = "References\n1. A. Author, J. Am. Chem. Soc. 2016, 138, 2012-2020.\n2. B. Author, Science (2018).\n"
+    assert extract_year(body + refs) == 2018
+
+
+def test_extract_year_none_without_references():
+    assert extract_year("BET 2000 m2/g; measured 2019.") is None
+
+
+# ---------- manifest ----------
+def test_manifest_roundtrip(tmp_path):
+    assert load_manifest(str(tmp_path)) == {}
+    save_manifest(str(tmp_path), MANIFEST)
+    assert load_manifest(str(tmp_path)) == MANIFEST